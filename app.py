@@ -1,18 +1,47 @@
 import os
+import random
 from flask import Flask, render_template, redirect, url_for, request, flash, abort, jsonify
 from flask_login import LoginManager, UserMixin, current_user, login_user, logout_user, login_required
 from flask_socketio import SocketIO
-from functools import wraps
+from functools import wraps, lru_cache
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import json
+import time
 
 # Inicialización Flask y extensiones
 app = Flask(__name__)
+# Cantidad de proxies delante de la app (TRUST_PROXY=1 en Render). Solo entonces
+# remote_addr toma la IP que agrega el proxy a X-Forwarded-For; sin proxy ese
+# header lo elige el cliente y no se confía en él
+PROXIES_CONFIABLES = int(os.environ.get('TRUST_PROXY', 0))
+if PROXIES_CONFIABLES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXIES_CONFIABLES)
 app.config['SECRET_KEY'] = 'belgrano_tickets_secret_2025'
 
+# Entorno de ejecución (se resuelve una sola vez al importar)
+ES_PRODUCCION = os.environ.get('FLASK_ENV') == 'production'
+
+# Archivos estáticos cacheables por el navegador (Flask ya envía ETag y responde 304)
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+
+# Versión de la hoja de estilos (mtime al arrancar): cada deploy cambia la URL y
+# el navegador no sigue usando el CSS viejo durante el max-age
+STYLE_VERSION = int(os.path.getmtime(os.path.join(app.static_folder, 'style.css')))
+
+@app.context_processor
+def inyectar_style_version():
+    return {'style_version': STYLE_VERSION}
+
+# jsonify sin ordenar claves: las respuestas conservan el orden de los dicts
+app.json.sort_keys = False
+
+# En producción los templates no cambian: evitar stat() del archivo en cada render
+if ES_PRODUCCION:
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+
 # Configuración de base de datos - USAR RUTA ABSOLUTA
-import os
 db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'belgrano_tickets.db')
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -92,21 +121,95 @@ def from_json_filter(value):
     except (json.JSONDecodeError, TypeError):
         return []
 
+# Timestamp ISO cacheado con granularidad de 1 segundo
+@lru_cache(maxsize=1)
+def _iso_now_cached(segundo):
+    return datetime.now().isoformat()
+
+def iso_now():
+    """Timestamp ISO actual, reutilizado entre llamadas del mismo segundo"""
+    return _iso_now_cached(int(time.time()))
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+# Repartidores de la flota (nombres usados en Ticket.repartidor)
+REPARTIDORES = ['Repartidor1', 'Repartidor2', 'Repartidor3', 'Repartidor4', 'Repartidor5']
+
 # Decorador para roles
 def role_required(role):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if not hasattr(current_user, 'role') or current_user.role != role:
+            if getattr(current_user, 'role', None) != role:
                 abort(403)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
+# Decorador para endpoints JSON: errores inesperados como {'status': 'error'} 500
+def errores_json(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'error': str(e)
+            }), 500
+    return decorated_function
+
+# Hash contra el que se verifica cuando el usuario no existe (se calcula una vez, al primer uso)
+@lru_cache(maxsize=1)
+def hash_ficticio():
+    return generate_password_hash('usuario-inexistente')
+
+# Límite de intentos fallidos de login (ventana fija, en memoria): por cliente y
+# email, y por cliente en total para que una IP no pruebe muchos emails
+LOGIN_MAX_INTENTOS = 5
+LOGIN_MAX_INTENTOS_IP = 20
+LOGIN_VENTANA_SEGS = 300
+_intentos_fallidos = {}
+_ultima_purga = [time.monotonic()]
+
+def _clave_intentos(email):
+    return (request.remote_addr, email)
+
+def _clave_intentos_ip():
+    return (request.remote_addr, None)
+
+def _supera_limite(clave, limite):
+    registro = _intentos_fallidos.get(clave)
+    if registro is None:
+        return False
+    if time.monotonic() - registro[1] > LOGIN_VENTANA_SEGS:
+        del _intentos_fallidos[clave]
+        return False
+    return registro[0] >= limite
+
+def login_bloqueado(email):
+    """True si el cliente superó los intentos fallidos permitidos para este email o en total"""
+    return (_supera_limite(_clave_intentos(email), LOGIN_MAX_INTENTOS)
+            or _supera_limite(_clave_intentos_ip(), LOGIN_MAX_INTENTOS_IP))
+
+def registrar_intento_fallido(email):
+    ahora = time.monotonic()
+    # Evitar que el registro crezca sin límite: purgar ventanas vencidas
+    # como mucho una vez por ventana, no en cada intento
+    if ahora - _ultima_purga[0] > LOGIN_VENTANA_SEGS:
+        _ultima_purga[0] = ahora
+        for clave in [c for c, r in _intentos_fallidos.items() if ahora - r[1] > LOGIN_VENTANA_SEGS]:
+            del _intentos_fallidos[clave]
+    for clave in (_clave_intentos(email), _clave_intentos_ip()):
+        registro = _intentos_fallidos.get(clave)
+        if registro is None or ahora - registro[1] > LOGIN_VENTANA_SEGS:
+            _intentos_fallidos[clave] = [1, ahora]
+        else:
+            registro[0] += 1
+
 # Rutas principales
 @app.route('/')
 def home():
@@ -127,10 +230,19 @@ def login():
             flash('Por favor complete todos los campos', 'warning')
             return render_template('login.html')
         
+        if login_bloqueado(email):
+            print(f"⛔ Login bloqueado temporalmente: {email}")
+            flash('Demasiados intentos fallidos. Intente nuevamente en unos minutos.', 'danger')
+            return render_template('login.html'), 429
+        
         # Buscar usuario por email
         user = User.query.filter_by(email=email).first()
         
-        if user:
+        # Verificar contraseña siempre (contra un hash ficticio si el email no existe)
+        # para que el tiempo de respuesta no revele qué emails están registrados
+        password_ok = check_password_hash(user.password if user else hash_ficticio(), password)
+        
+        if user and password_ok:
             print(f"✅ Usuario encontrado: {user.nombre} (ID: {user.id})")
             print(f"   Role: {user.role}")
             print(f"   Activo: {user.activo}")
@@ -141,17 +253,20 @@ def login():
                 flash('Usuario inactivo. Contacte al administrador.', 'danger')
                 return render_template('login.html')
             
-            # Verificar contraseña
-            if check_password_hash(user.password, password):
-                print("✅ Contraseña correcta - Login exitoso")
-                login_user(user)
-                flash(f'Bienvenido, {user.nombre}!', 'success')
-                return redirect(url_for('panel'))
-            else:
-                print("❌ Contraseña incorrecta")
-                flash('Email o contraseña incorrectos', 'danger')
+            print("✅ Contraseña correcta - Login exitoso")
+            # Solo se reinicia el contador de este email: el total por IP sigue
+            # contando, así un login válido no habilita más intentos contra otras cuentas
+            _intentos_fallidos.pop(_clave_intentos(email), None)
+            login_user(user)
+            flash(f'Bienvenido, {user.nombre}!', 'success')
+            return redirect(url_for('panel'))
+        elif user:
+            print("❌ Contraseña incorrecta")
+            registrar_intento_fallido(email)
+            flash('Email o contraseña incorrectos', 'danger')
         else:
             print(f"❌ Usuario no encontrado: {email}")
+            registrar_intento_fallido(email)
             flash('Email o contraseña incorrectos', 'danger')
     
     return render_template('login.html')
@@ -162,153 +277,162 @@ def logout():
     logout_user()
     return redirect(url_for('login'))
 
+# Credenciales por defecto informadas por /debug/credenciales
+CREDENCIALES_DEMO = {
+    'credenciales_admin': {
+        'email': 'admin@belgranoahorro.com',
+        'password': 'admin123'
+    },
+    'credenciales_flota': {
+        'email': 'repartidor1@belgranoahorro.com',
+        'password': 'flota123'
+    }
+}
+
 @app.route('/debug/credenciales')
+@errores_json
 def debug_credenciales():
     """Ruta de debug para verificar credenciales (solo en desarrollo)"""
-    try:
-        usuarios = User.query.all()
-        credenciales = []
-        
-        for user in usuarios:
-            credenciales.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'nombre': user.nombre,
-                'role': user.role,
-                'activo': user.activo,
-                'password_hash': user.password[:50] + '...' if user.password else 'None'
-            })
-        
-        return jsonify({
-            'status': 'success',
-            'total_usuarios': len(usuarios),
-            'usuarios': credenciales,
-            'credenciales_admin': {
-                'email': 'admin@belgranoahorro.com',
-                'password': 'admin123'
-            },
-            'credenciales_flota': {
-                'email': 'repartidor1@belgranoahorro.com',
-                'password': 'flota123'
-            }
+    usuarios = User.query.all()
+    credenciales = []
+    
+    for user in usuarios:
+        credenciales.append({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'nombre': user.nombre,
+            'role': user.role,
+            'activo': user.activo,
+            'password_hash': user.password[:50] + '...' if user.password else 'None'
         })
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    
+    return jsonify({
+        'status': 'success',
+        'total_usuarios': len(usuarios),
+        'usuarios': credenciales,
+        **CREDENCIALES_DEMO
+    })
+
+# Parte estática de la respuesta de /health
+HEALTH_INFO = {
+    'status': 'healthy',
+    'service': 'Belgrano Tickets',
+    'database': 'connected',
+    'version': '2.0.0'
+}
+
+# Conteos de /health cacheados para no consultar la BD en cada sondeo
+HEALTH_CACHE_TTL = 5.0
+_HEALTH_CACHE = {'ts': 0.0, 'data': None}
 
 @app.route('/health')
 def health_check():
     """Health check para verificar que la aplicación esté funcionando"""
     try:
-        # Verificar que la base de datos esté funcionando
-        total_tickets = Ticket.query.count()
-        total_usuarios = User.query.count()
+        # Verificar que la base de datos esté funcionando (resultado cacheado unos segundos)
+        ahora = time.monotonic()
+        if _HEALTH_CACHE['data'] is None or ahora - _HEALTH_CACHE['ts'] > HEALTH_CACHE_TTL:
+            _HEALTH_CACHE['data'] = {
+                'total_tickets': Ticket.query.count(),
+                'total_usuarios': User.query.count()
+            }
+            _HEALTH_CACHE['ts'] = ahora
         
         return jsonify({
-            'status': 'healthy',
-            'service': 'Belgrano Tickets',
-            'timestamp': datetime.now().isoformat(),
-            'database': 'connected',
-            'total_tickets': total_tickets,
-            'total_usuarios': total_usuarios,
-            'version': '2.0.0'
+            **HEALTH_INFO,
+            **_HEALTH_CACHE['data'],
+            'timestamp': iso_now()
         }), 200
     except Exception as e:
         return jsonify({
             'status': 'unhealthy',
             'error': str(e),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': iso_now()
         }), 500
 
 @app.route('/debug/reparar_credenciales', methods=['POST'])
+@errores_json
 def reparar_credenciales_debug():
     """Ruta para reparar credenciales en producción"""
-    try:
-        # Verificar si es producción
-        if app.config.get('ENV') == 'production':
-            # Solo permitir en producción si hay un token secreto
-            token = request.headers.get('X-Repair-Token')
-            if token != 'belgrano_repair_2025':
-                return jsonify({'error': 'Token no válido'}), 403
-        
-        # Ejecutar reparación
-        from werkzeug.security import generate_password_hash
-        
-        # Buscar o crear usuario admin
-        admin = User.query.filter_by(email='admin@belgranoahorro.com').first()
-        
-        if admin:
-            admin.password = generate_password_hash('admin123')
-            admin.activo = True
-            admin.role = 'admin'
-            admin.nombre = 'Administrador Principal'
+    # Verificar si es producción
+    if ES_PRODUCCION:
+        # Solo permitir en producción si hay un token secreto
+        token = request.headers.get('X-Repair-Token')
+        if token != 'belgrano_repair_2025':
+            return jsonify({'error': 'Token no válido'}), 403
+    
+    # Ejecutar reparación
+    # Buscar o crear usuario admin
+    admin = User.query.filter_by(email='admin@belgranoahorro.com').first()
+    
+    if admin:
+        admin.password = generate_password_hash('admin123')
+        admin.activo = True
+        admin.role = 'admin'
+        admin.nombre = 'Administrador Principal'
+    else:
+        admin = User(
+            username='admin',
+            email='admin@belgranoahorro.com',
+            password=generate_password_hash('admin123'),
+            role='admin',
+            nombre='Administrador Principal',
+            activo=True
+        )
+        db.session.add(admin)
+    
+    # Verificar usuarios flota
+    flota_emails = [
+        'repartidor1@belgranoahorro.com',
+        'repartidor2@belgranoahorro.com',
+        'repartidor3@belgranoahorro.com',
+        'repartidor4@belgranoahorro.com',
+        'repartidor5@belgranoahorro.com'
+    ]
+    
+    flota_nombres = [
+        'Repartidor 1',
+        'Repartidor 2',
+        'Repartidor 3',
+        'Repartidor 4',
+        'Repartidor 5'
+    ]
+    
+    # Traer todos los usuarios flota existentes en una sola consulta
+    flota_existentes = {
+        u.email: u for u in User.query.filter(User.email.in_(flota_emails)).all()
+    }
+    
+    for i, (email, nombre) in enumerate(zip(flota_emails, flota_nombres), 1):
+        flota_user = flota_existentes.get(email)
+        
+        if flota_user:
+            flota_user.password = generate_password_hash('flota123')
+            flota_user.activo = True
+            flota_user.role = 'flota'
+            flota_user.nombre = nombre
         else:
-            admin = User(
-                username='admin',
-                email='admin@belgranoahorro.com',
-                password=generate_password_hash('admin123'),
-                role='admin',
-                nombre='Administrador Principal',
+            flota_user = User(
+                username=f'repartidor{i}',
+                email=email,
+                password=generate_password_hash('flota123'),
+                role='flota',
+                nombre=nombre,
                 activo=True
             )
-            db.session.add(admin)
-        
-        # Verificar usuarios flota
-        flota_emails = [
-            'repartidor1@belgranoahorro.com',
-            'repartidor2@belgranoahorro.com',
-            'repartidor3@belgranoahorro.com',
-            'repartidor4@belgranoahorro.com',
-            'repartidor5@belgranoahorro.com'
-        ]
-        
-        flota_nombres = [
-            'Repartidor 1',
-            'Repartidor 2',
-            'Repartidor 3',
-            'Repartidor 4',
-            'Repartidor 5'
-        ]
-        
-        for i, email in enumerate(flota_emails):
-            flota_user = User.query.filter_by(email=email).first()
-            
-            if flota_user:
-                flota_user.password = generate_password_hash('flota123')
-                flota_user.activo = True
-                flota_user.role = 'flota'
-                flota_user.nombre = flota_nombres[i]
-            else:
-                flota_user = User(
-                    username=f'repartidor{i+1}',
-                    email=email,
-                    password=generate_password_hash('flota123'),
-                    role='flota',
-                    nombre=flota_nombres[i],
-                    activo=True
-                )
-                db.session.add(flota_user)
-        
-        db.session.commit()
-        
-        return jsonify({
-            'status': 'success',
-            'message': 'Credenciales reparadas exitosamente',
-            'credenciales': {
-                'admin': 'admin@belgranoahorro.com / admin123',
-                'flota': 'repartidor1@belgranoahorro.com / flota123'
-            }
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+            db.session.add(flota_user)
+    
+    db.session.commit()
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Credenciales reparadas exitosamente',
+        'credenciales': {
+            'admin': 'admin@belgranoahorro.com / admin123',
+            'flota': 'repartidor1@belgranoahorro.com / flota123'
+        }
+    })
 
 @app.route('/panel')
 @login_required
@@ -356,13 +480,14 @@ def recibir_ticket_externo():
         )
         
         db.session.add(ticket)
-        db.session.commit()
         
-        # Asignar automáticamente a un repartidor aleatorio
+        # Asignar automáticamente a un repartidor aleatorio (misma transacción)
         repartidor_asignado = asignar_repartidor_automatico(ticket)
         if repartidor_asignado:
             ticket.repartidor = repartidor_asignado
-            db.session.commit()
+        
+        db.session.commit()
+        if repartidor_asignado:
             print(f"✅ Ticket asignado automáticamente a {repartidor_asignado}")
         
         # Emitir evento WebSocket para actualización en tiempo real
@@ -390,24 +515,19 @@ def asignar_repartidor_automatico(ticket):
     """
     Asigna automáticamente un repartidor aleatorio que no tenga tickets de prioridad máxima
     """
-    import random
-    
     # Lista de repartidores disponibles
-    repartidores = ['Repartidor1', 'Repartidor2', 'Repartidor3', 'Repartidor4', 'Repartidor5']
+    repartidores = REPARTIDORES
     
-    # Filtrar repartidores que no tengan tickets de prioridad máxima
-    repartidores_disponibles = []
+    # Repartidores con tickets de prioridad máxima, en una sola consulta
+    ocupados = {
+        nombre for (nombre,) in db.session.query(Ticket.repartidor_nombre).filter(
+            Ticket.repartidor_nombre.in_(repartidores),
+            Ticket.prioridad == 'alta'
+        ).distinct()
+    }
     
-    for repartidor in repartidores:
-        # Contar tickets de prioridad máxima para este repartidor
-        tickets_prioridad_maxima = Ticket.query.filter_by(
-            repartidor=repartidor, 
-            prioridad='alta'
-        ).count()
-        
-        # Si no tiene tickets de prioridad máxima, está disponible
-        if tickets_prioridad_maxima == 0:
-            repartidores_disponibles.append(repartidor)
+    # Filtrar repartidores que no tengan tickets de prioridad máxima
+    repartidores_disponibles = [r for r in repartidores if r not in ocupados]
     
     # Si no hay repartidores disponibles sin prioridad máxima, usar todos
     if not repartidores_disponibles:
@@ -456,26 +576,28 @@ def actualizar_estado_ticket(ticket_id):
 
 @app.route('/gestion_flota')
 @login_required
+@role_required('admin')
 def gestion_flota():
-    if current_user.role != 'admin':
-        return 'Acceso no permitido', 403
-    
     # Obtener todos los repartidores disponibles
-    repartidores = ['Repartidor1', 'Repartidor2', 'Repartidor3', 'Repartidor4', 'Repartidor5']
+    repartidores = REPARTIDORES
     
     # Obtener tickets con repartidores asignados
     tickets_asignados = Ticket.query.filter(Ticket.repartidor.isnot(None)).all()
     
-    # Estadísticas por repartidor
-    stats_repartidores = {}
-    for rep in repartidores:
-        tickets_rep = Ticket.query.filter_by(repartidor=rep).all()
-        stats_repartidores[rep] = {
-            'total': len(tickets_rep),
-            'pendientes': len([t for t in tickets_rep if t.estado == 'pendiente']),
-            'en_camino': len([t for t in tickets_rep if t.estado == 'en-camino']),
-            'entregados': len([t for t in tickets_rep if t.estado == 'entregado'])
-        }
+    # Estadísticas por repartidor en una sola pasada sobre los tickets ya cargados
+    claves_estado = {'pendiente': 'pendientes', 'en-camino': 'en_camino', 'entregado': 'entregados'}
+    stats_repartidores = {
+        rep: {'total': 0, 'pendientes': 0, 'en_camino': 0, 'entregados': 0}
+        for rep in repartidores
+    }
+    for t in tickets_asignados:
+        stats = stats_repartidores.get(t.repartidor)
+        if stats is None:
+            continue
+        stats['total'] += 1
+        clave = claves_estado.get(t.estado)
+        if clave:
+            stats[clave] += 1
     
     return render_template('gestion_flota.html', 
                          repartidores=repartidores, 
@@ -484,21 +606,27 @@ def gestion_flota():
 
 @app.route('/reportes')
 @login_required
+@role_required('admin')
 def reportes():
-    if current_user.role != 'admin':
-        return 'Acceso no permitido', 403
-    
-    # Estadísticas generales
-    total_tickets = Ticket.query.count()
-    tickets_pendientes = Ticket.query.filter_by(estado='pendiente').count()
-    tickets_en_camino = Ticket.query.filter_by(estado='en-camino').count()
-    tickets_entregados = Ticket.query.filter_by(estado='entregado').count()
-    
-    # Tickets por repartidor
-    tickets_por_repartidor = {}
-    repartidores = ['Repartidor1', 'Repartidor2', 'Repartidor3', 'Repartidor4', 'Repartidor5']
-    for rep in repartidores:
-        tickets_por_repartidor[rep] = Ticket.query.filter_by(repartidor=rep).count()
+    # Estadísticas generales (una consulta agrupada por estado)
+    por_estado = dict(
+        db.session.query(Ticket.estado, db.func.count(Ticket.id))
+        .group_by(Ticket.estado)
+        .all()
+    )
+    total_tickets = sum(por_estado.values())
+    tickets_pendientes = por_estado.get('pendiente', 0)
+    tickets_en_camino = por_estado.get('en-camino', 0)
+    tickets_entregados = por_estado.get('entregado', 0)
+    
+    # Tickets por repartidor (una consulta agrupada por repartidor)
+    por_repartidor = dict(
+        db.session.query(Ticket.repartidor_nombre, db.func.count(Ticket.id))
+        .filter(Ticket.repartidor_nombre.in_(REPARTIDORES))
+        .group_by(Ticket.repartidor_nombre)
+        .all()
+    )
+    tickets_por_repartidor = {rep: por_repartidor.get(rep, 0) for rep in REPARTIDORES}
     
     return render_template('reportes.html',
                          total_tickets=total_tickets,
@@ -712,7 +840,6 @@ def cambiar_password():
     return render_template('cambiar_password.html')
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
     print("🚀 Iniciando aplicación de tickets en puerto 5001...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5001)
+    # Servidor de desarrollo; en producción se usa gunicorn con worker eventlet (start_ticketera.sh)
+    socketio.run(app, debug=not ES_PRODUCCION, host='0.0.0.0', port=5001)
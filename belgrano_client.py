@@ -6,33 +6,60 @@ Cliente API para conectar Belgrano Tickets con Belgrano Ahorro
 
 import requests
 import os
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 from typing import Dict, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+# Configuración desde el entorno (se lee una sola vez al importar)
+BELGRANO_AHORRO_URL = os.environ.get('BELGRANO_AHORRO_URL', 'http://localhost:5000')
+BELGRANO_AHORRO_TIMEOUT = int(os.environ.get('BELGRANO_AHORRO_TIMEOUT', 30))
+BELGRANO_AHORRO_CONNECT_TIMEOUT = float(os.environ.get('BELGRANO_AHORRO_CONNECT_TIMEOUT', 3))
+
 class BelgranoAhorroClient:
     """Cliente para conectar con la API de Belgrano Ahorro"""
     
-    def __init__(self, base_url: str = None, timeout: int = 30):
+    def __init__(self, base_url: str = None, timeout: int = None, cache_ttl: int = 60):
         """
         Inicializar cliente
         
         Args:
             base_url: URL base de Belgrano Ahorro
-            timeout: Timeout para requests en segundos
+            timeout: Timeout de lectura en segundos (default: BELGRANO_AHORRO_TIMEOUT);
+                la conexión usa BELGRANO_AHORRO_CONNECT_TIMEOUT
+            cache_ttl: Segundos que se reutilizan los catálogos (productos, negocios, sucursales)
         """
-        self.base_url = base_url or os.environ.get('BELGRANO_AHORRO_URL', 'http://localhost:5000')
-        self.timeout = timeout
+        # Base normalizada una sola vez: los endpoints se concatenan directamente
+        self.base_url = (base_url or BELGRANO_AHORRO_URL).rstrip('/')
+        # (conexión, lectura): un host caído falla rápido sin acortar respuestas lentas
+        self.timeout = (BELGRANO_AHORRO_CONNECT_TIMEOUT, timeout or BELGRANO_AHORRO_TIMEOUT)
+        self.cache_ttl = cache_ttl
+        self._cache = {}
         self.session = requests.Session()
         
+        # Pool de conexiones keep-alive con reintentos ante errores transitorios:
+        # solo fallos de conexión y 502/503/504. read=False no reintenta y deja pasar
+        # el ReadTimeout original; Retry-After se ignora para no dormir lo que pida el server
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(connect=2, read=False, status=2, backoff_factor=0.2,
+                              status_forcelist=[502, 503, 504],
+                              respect_retry_after_header=False)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # Configurar headers por defecto
         self.session.headers.update({
             'Content-Type': 'application/json',
             'User-Agent': 'BelgranoTickets/1.0'
         })
         
-        logger.info(f"🔗 Cliente inicializado para: {self.base_url}")
+        logger.info("🔗 Cliente inicializado para: %s", self.base_url)
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict]:
         """
@@ -59,13 +86,57 @@ class BelgranoAhorroClient:
             response.raise_for_status()
             return response.json()
             
+        except requests.exceptions.Timeout as e:
+            logger.error("⏱️ Belgrano Ahorro tardó demasiado en responder %s: %s", url, e)
+            return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Error en request a {url}: {e}")
+            logger.error("❌ Error en request a %s: %s", url, e)
             return None
         except Exception as e:
-            logger.error(f"❌ Error inesperado: {e}")
+            logger.error("❌ Error inesperado: %s", e)
             return None
     
+    def _get_cacheado(self, endpoint: str) -> Optional[Any]:
+        """
+        GET con cache en memoria por endpoint durante cache_ttl segundos
+        
+        Args:
+            endpoint: Endpoint de la API
+            
+        Returns:
+            Respuesta JSON (posiblemente cacheada) o None si hay error
+        """
+        entrada = self._cache.get(endpoint)
+        if entrada and time.monotonic() - entrada[0] < self.cache_ttl:
+            return entrada[1]
+        
+        response = self._make_request('GET', endpoint)
+        if response:
+            self._cache[endpoint] = (time.monotonic(), response)
+        return response
+    
+    def _get_lista(self, endpoint: str, descripcion: str, cache: bool = True) -> List[Dict]:
+        """
+        GET de un listado, registrando cuántos elementos se obtuvieron
+        
+        Args:
+            endpoint: Endpoint de la API
+            descripcion: Qué se lista, para los logs (p. ej. 'productos')
+            cache: Si se usa el cache de catálogos
+            
+        Returns:
+            Copia de la lista obtenida (los elementos se comparten con el cache
+            y son de solo lectura), o lista vacía si hay error
+        """
+        response = self._get_cacheado(endpoint) if cache else self._make_request('GET', endpoint)
+        if response:
+            logger.info("✅ Se obtuvieron %s %s", len(response), descripcion)
+            # Copia: quien agregue o quite elementos no altera el cache de los demás
+            return list(response)
+        else:
+            logger.warning("⚠️ No se pudieron obtener %s", descripcion)
+            return []
+    
     def test_connection(self) -> bool:
         """
         Probar conexión con Belgrano Ahorro
@@ -76,15 +147,16 @@ class BelgranoAhorroClient:
         logger.info("🔍 Probando conexión con Belgrano Ahorro...")
         
         try:
-            response = self.session.get(f"{self.base_url}/", timeout=5)
+            # HEAD: solo interesa el status, no descargar el cuerpo de la página
+            response = self.session.head(f"{self.base_url}/", timeout=(BELGRANO_AHORRO_CONNECT_TIMEOUT, 5), allow_redirects=True)
             if response.status_code == 200:
                 logger.info("✅ Conexión exitosa con Belgrano Ahorro")
                 return True
             else:
-                logger.warning(f"⚠️ Respuesta inesperada: {response.status_code}")
+                logger.warning("⚠️ Respuesta inesperada: %s", response.status_code)
                 return False
         except Exception as e:
-            logger.error(f"❌ Error de conexión: {e}")
+            logger.error("❌ Error de conexión: %s", e)
             return False
     
     def get_usuarios(self) -> List[Dict]:
@@ -96,13 +168,7 @@ class BelgranoAhorroClient:
         """
         logger.info("👥 Obteniendo usuarios desde Belgrano Ahorro...")
         
-        response = self._make_request('GET', '/api/tickets/usuarios')
-        if response:
-            logger.info(f"✅ Obtenidos {len(response)} usuarios")
-            return response
-        else:
-            logger.warning("⚠️ No se pudieron obtener usuarios")
-            return []
+        return self._get_lista('/api/tickets/usuarios', 'usuarios', cache=False)
     
     def get_productos(self) -> List[Dict]:
         """
@@ -113,13 +179,7 @@ class BelgranoAhorroClient:
         """
         logger.info("📦 Obteniendo productos desde Belgrano Ahorro...")
         
-        response = self._make_request('GET', '/api/tickets/productos')
-        if response:
-            logger.info(f"✅ Obtenidos {len(response)} productos")
-            return response
-        else:
-            logger.warning("⚠️ No se pudieron obtener productos")
-            return []
+        return self._get_lista('/api/tickets/productos', 'productos')
     
     def verificar_usuario(self, email: str, password: str) -> Optional[Dict]:
         """
@@ -132,7 +192,7 @@ class BelgranoAhorroClient:
         Returns:
             Datos del usuario si las credenciales son válidas
         """
-        logger.info(f"🔐 Verificando usuario: {email}")
+        logger.info("🔐 Verificando usuario: %s", email)
         
         data = {
             'email': email,
@@ -156,13 +216,7 @@ class BelgranoAhorroClient:
         """
         logger.info("🏪 Obteniendo negocios desde Belgrano Ahorro...")
         
-        response = self._make_request('GET', '/api/tickets/negocios')
-        if response:
-            logger.info(f"✅ Obtenidos {len(response)} negocios")
-            return response
-        else:
-            logger.warning("⚠️ No se pudieron obtener negocios")
-            return []
+        return self._get_lista('/api/tickets/negocios', 'negocios')
     
     def get_sucursales(self, negocio_id: str) -> List[Dict]:
         """
@@ -174,15 +228,9 @@ class BelgranoAhorroClient:
         Returns:
             Lista de sucursales
         """
-        logger.info(f"🏪 Obteniendo sucursales del negocio: {negocio_id}")
+        logger.info("🏪 Obteniendo sucursales del negocio: %s", negocio_id)
         
-        response = self._make_request('GET', f'/api/tickets/negocios/{negocio_id}/sucursales')
-        if response:
-            logger.info(f"✅ Obtenidas {len(response)} sucursales")
-            return response
-        else:
-            logger.warning("⚠️ No se pudieron obtener sucursales")
-            return []
+        return self._get_lista(f'/api/tickets/negocios/{negocio_id}/sucursales', 'sucursales')
     
     def get_productos_sucursal(self, negocio_id: str, sucursal_id: str) -> List[Dict]:
         """
@@ -195,15 +243,9 @@ class BelgranoAhorroClient:
         Returns:
             Lista de productos
         """
-        logger.info(f"📦 Obteniendo productos de sucursal: {sucursal_id}")
+        logger.info("📦 Obteniendo productos de sucursal: %s", sucursal_id)
         
-        response = self._make_request('GET', f'/api/tickets/negocios/{negocio_id}/sucursales/{sucursal_id}/productos')
-        if response:
-            logger.info(f"✅ Obtenidos {len(response)} productos de la sucursal")
-            return response
-        else:
-            logger.warning("⚠️ No se pudieron obtener productos de la sucursal")
-            return []
+        return self._get_lista(f'/api/tickets/negocios/{negocio_id}/sucursales/{sucursal_id}/productos', 'productos de la sucursal')
 
 # Instancia global del cliente
 belgrano_client = BelgranoAhorroClient()
@@ -35,6 +35,7 @@ class Ticket(db.Model):
     indicaciones = db.Column(db.Text)
     asignado_a = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     repartidor_nombre = db.Column(db.String(50), nullable=True)  # Nombre del repartidor
+    repartidor = db.synonym('repartidor_nombre')  # Alias usado por las vistas y templates
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_asignacion = db.Column(db.DateTime, nullable=True)
     fecha_entrega = db.Column(db.DateTime, nullable=True)
@@ -118,4 +118,6 @@ echo "Iniciando aplicacion en puerto $PORT..."
 echo "La ticketera estara disponible en http://localhost:$PORT"
 
 # Ejecutar la aplicacion con gunicorn para produccion
-exec gunicorn --bind 0.0.0.0:$PORT --workers 2 --timeout 120 app:app
+# Worker eventlet (un solo proceso, como requiere Flask-SocketIO): atiende
+# conexiones concurrentes y websockets sin bloquear un worker por request
+exec gunicorn --worker-class eventlet --workers 1 --worker-connections 200 --bind 0.0.0.0:$PORT --timeout 120 app:app
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Verificar que un GET lento a Belgrano Ahorro termina en el log de timeout
+(⏱️) y no se reintenta: levanta un servidor local que tarda más que el
+timeout de lectura del cliente.
+"""
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from belgrano_client import BelgranoAhorroClient
+
+DEMORA_SERVIDOR = 3
+TIMEOUT_LECTURA = 1
+
+class ServidorLento(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DEMORA_SERVIDOR)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'[]')
+        except OSError:
+            pass  # el cliente ya cortó la conexión
+
+    def log_message(self, *args):
+        pass
+
+class CapturarLogs(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.mensajes = []
+
+    def emit(self, record):
+        self.mensajes.append(record.getMessage())
+
+def test_timeout_lectura():
+    """Un GET de catálogo lento debe registrarse como timeout, sin reintentos"""
+    print("🧪 Probando timeout de lectura contra un servidor lento...")
+
+    servidor = HTTPServer(('127.0.0.1', 0), ServidorLento)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    logs = CapturarLogs()
+    logging.getLogger('belgrano_client').addHandler(logs)
+
+    cliente = BelgranoAhorroClient(
+        base_url=f"http://127.0.0.1:{servidor.server_port}",
+        timeout=TIMEOUT_LECTURA
+    )
+    inicio = time.monotonic()
+    productos = cliente.get_productos()
+    duracion = time.monotonic() - inicio
+    servidor.shutdown()
+
+    timeouts = [m for m in logs.mensajes if m.startswith('⏱️')]
+    if productos != [] or not timeouts:
+        print(f"❌ El GET lento no pasó por la rama de timeout: {logs.mensajes}")
+        return False
+    if duracion >= 2 * TIMEOUT_LECTURA:
+        print(f"❌ El GET lento se reintentó ({duracion:.1f}s)")
+        return False
+
+    print(f"✅ Timeout registrado en {duracion:.1f}s: {timeouts[0]}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if test_timeout_lectura() else 1)